@@ -1,20 +1,234 @@
 import pandas as pd
 import numpy as np
-import json
+import ast
+import copy
+import functools
 import re
-import os
 from loguru import logger
-import traceback
 import random
+import ahocorasick
+from rapidfuzz import process, fuzz
+from json_utils import loads as _loads
 # Import responses from the responses module
 from responses import (
     CATEGORY_RESPONSES, FALLBACK_RESPONSES, DEVICE_TEMPLATES, 
     FEATURE_KEYWORDS, RECOMMENDATION_KEYWORDS, DEVICE_TYPES, 
     POPULAR_BRANDS, COMPARISON_KEYWORDS, SPECIFICATION_KEYWORDS,
+    RECOMMENDATION_RE, COMPARISON_RE,
     QUERY_TYPES, SENTIMENT_KEYWORDS, USAGE_PATTERN_KEYWORDS,
     ADVANCED_RESPONSES, USAGE_PATTERN_RESPONSES, TROUBLESHOOTING_RESPONSES
 )
 
+# Identifier columns of a device row, in the order they are formatted
+DEVICE_RECORD_COLUMNS = ['brand_name', 'device_name', 'device_url', 'device_image']
+
+# Source columns of the specifications CSV that are parsed at load time or unused
+RAW_DATA_COLUMNS = ['full_device_name', 'pictures', 'specifications']
+
+
+def _build_automaton(entries):
+    """Build an Aho-Corasick automaton from (word, value) pairs.
+    
+    Every word maps to the list of values registered for it, so words shared by
+    several entries (e.g. the same device name under two brands) keep all of them.
+    """
+    automaton = ahocorasick.Automaton()
+    for word, value in entries:
+        if not word:
+            continue
+        if word in automaton:
+            automaton.get(word).append(value)
+        else:
+            automaton.add_word(word, [value])
+    if len(automaton) > 0:
+        automaton.make_automaton()
+    return automaton
+
+
+def _iter_automaton(automaton, text):
+    """Yield the values of every word found in text with a single pass over it."""
+    # An automaton without any words cannot be searched
+    if automaton.kind != ahocorasick.AHOCORASICK:
+        return
+    for _, values in automaton.iter(text):
+        yield from values
+
+
+# Simple conversational intents detected by analyze_query_intent
+SIMPLE_INTENTS = {
+    'greeting': ['hi', 'hello', 'hey', 'greetings'],
+    'farewell': ['bye', 'goodbye', 'see you'],
+    'thanks': ['thank you', 'thanks'],
+    'help': ['help', 'assist', 'how to use']
+}
+
+# Feature and simple intent keywords used by analyze_query_intent, tagged with the intent they signal
+INTENT_AUTOMATON = _build_automaton(
+    [(keyword, ('feature', feature)) for feature, keywords in FEATURE_KEYWORDS.items() for keyword in keywords] +
+    [(keyword, ('simple', intent)) for intent, keywords in SIMPLE_INTENTS.items() for keyword in keywords]
+)
+
+# Simple keyword-based conversation categories checked by _categorize_input
+CONVERSATION_CATEGORIES = {
+    'greeting': ['hi', 'hello', 'hey', 'greetings', 'good morning', 'good afternoon', 'good evening'],
+    'farewell': ['bye', 'goodbye', 'see you', 'talk to you later'],
+    'thanks': ['thank you', 'thanks', 'appreciate it'],
+    'identity': ['who are you', 'what are you', 'your name', 'about you'],
+    'help': ['help', 'assist', 'guidance', 'how to use', 'what can you do', 'capabilities']
+}
+
+# Every keyword used by _categorize_input, tagged with the check it belongs to
+CATEGORY_AUTOMATON = _build_automaton(
+    [(device_type, ('device_type', device_type)) for device_type in DEVICE_TYPES] +
+    [(brand, ('brand', brand)) for brand in POPULAR_BRANDS] +
+    [(keyword, ('recommendation', None)) for keyword in RECOMMENDATION_KEYWORDS] +
+    [(keyword, ('comparison', None)) for keyword in COMPARISON_KEYWORDS] +
+    [(keyword, ('specification', None)) for keyword in SPECIFICATION_KEYWORDS] +
+    [(keyword, ('feature', feature)) for feature, keywords in FEATURE_KEYWORDS.items() for keyword in keywords] +
+    [(keyword, ('category', keyword)) for keywords in CONVERSATION_CATEGORIES.values() for keyword in keywords]
+)
+
+# Brands whose devices are recommended first, in order of preference
+RECOMMENDED_BRANDS = ('Samsung', 'Apple', 'Google', 'Xiaomi', 'OnePlus', 'Huawei')
+RECOMMENDED_BRANDS_BY_LOWER = {brand.lower(): brand for brand in RECOMMENDED_BRANDS}
+
+# Recommendation highlights as (focus area, label, lookups). Each lookup is
+# (key spellings, field): a dict value contributes its field, a plain value
+# (field None) contributes itself. The first non-empty lookup wins.
+HIGHLIGHT_RULES = (
+    ('camera', 'Main camera', ((('main_camera', 'Main Camera'), 'modules'), (('main_camera', 'Main Camera'), None))),
+    ('battery', 'Battery', ((('battery_type',), None), (('battery',), 'type'))),
+    ('performance', 'Processor', ((('platform', 'Platform'), 'chipset'),)),
+    ('display', 'Display', ((('display', 'Display'), 'size'),)),
+    ('storage', 'Storage', ((('memory', 'Memory'), 'internal'),))
+)
+HIGHLIGHT_FOCUS_AREAS = frozenset(focus for focus, _, _ in HIGHLIGHT_RULES)
+
+# Features that describe a price range rather than a focus area
+PRICE_CATEGORIES = ('high_end', 'mid_range', 'budget')
+
+# Feature references that _categorize_input reports as their own category
+CATEGORIZED_FEATURES = ('price', 'camera', 'battery', 'performance', 'display')
+
+# Common specification keywords to look for, per specification type
+SPEC_KEYWORDS = {
+    'battery': ['battery', 'battery capacity', 'battery life', 'charge', 'charging'],
+    'camera': ['camera', 'megapixel', 'mp', 'photo', 'selfie', 'front camera', 'rear camera'],
+    'display': ['display', 'screen', 'resolution', 'refresh rate', 'hz', 'amoled', 'lcd', 'oled'],
+    'processor': ['processor', 'cpu', 'chipset', 'snapdragon', 'exynos', 'mediatek', 'tensor'],
+    'memory': ['memory', 'ram', 'storage', 'gb', 'tb'],
+    'dimensions': ['dimensions', 'size', 'width', 'height', 'weight'],
+    'os': ['os', 'android', 'ios', 'operating system', 'software'],
+    'price': ['price', 'cost', 'value', 'dollars', 'expensive', 'cheap']
+}
+
+# Reverse lookup from keyword to specification type
+SPEC_KEYWORD_TYPES = {keyword: spec_type for spec_type, keywords in SPEC_KEYWORDS.items() for keyword in keywords}
+
+# Single alternation over all specification keywords, longest first. A keyword
+# may follow a digit ('128gb', '50mp') and take an -s/-d/-r ending ('cameras',
+# 'charged', 'cheaper'), but must not start or end inside another word
+# ('os' in 'cost', 'mp' in 'compare')
+SPEC_KEYWORD_PATTERN = re.compile(
+    r'(?<![a-z])(' + '|'.join(sorted(map(re.escape, SPEC_KEYWORD_TYPES), key=len, reverse=True)) + r')(?:e?[sdr])?\b'
+)
+
+# Paths in the specs dictionary that hold each requested specification type
+SPEC_PATHS = {
+    'battery': ['battery', 'Battery', 'battery_type', 'battery life', 'charging'],
+    'camera': ['main_camera', 'selfie_camera', 'Main Camera', 'Selfie camera'],
+    'display': ['display', 'Display', 'display_type', 'resolution'],
+    'processor': ['platform', 'Platform', 'cpu', 'chipset', 'gpu'],
+    'memory': ['memory', 'Memory', 'internal', 'ram'],
+    'dimensions': ['dimensions', 'body', 'Body', 'weight'],
+    'os': ['os', 'platform', 'Platform'],
+    'price': ['price', 'price_info', 'Misc']
+}
+
+# Specification types shown for each feature-specific intent
+FEATURE_SPEC_TYPES = {
+    "camera": ["camera", "main_camera", "selfie_camera"],
+    "battery": ["battery", "battery_life", "charging"],
+    "performance": ["processor", "cpu", "chipset", "platform"],
+    "display": ["display", "screen"]
+}
+
+# Specification types compared when the query does not name any
+DEFAULT_COMPARISON_SPECS = ["processor", "camera", "display", "battery", "memory"]
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_spec_plan(requested_specs):
+    """Resolve a tuple of spec types to their lookup paths.
+    
+    Returns (spec_type, ((path, path_lower), ...)) pairs with unknown spec types
+    dropped, so repeated extractions for the same request skip the SPEC_PATHS
+    lookups and key lowercasing.
+    """
+    return tuple(
+        (spec_type, tuple((path, path.lower()) for path in SPEC_PATHS[spec_type]))
+        for spec_type in requested_specs
+        if spec_type in SPEC_PATHS
+    )
+
+
+def _first_present(mapping, *keys):
+    """Return the value of the first of keys present in mapping, or None."""
+    for key in keys:
+        if key in mapping:
+            return mapping[key]
+    return None
+
+
+def _highlight_value(specs, lookups):
+    """Return the first non-empty value found by a HIGHLIGHT_RULES lookup, or None."""
+    for keys, field in lookups:
+        value = _first_present(specs, *keys)
+        if field is not None:
+            value = value.get(field) if isinstance(value, dict) else None
+        elif isinstance(value, dict):
+            value = None
+        if value:
+            return value
+    return None
+
+
+def _parse_specs_json(specs_str):
+    """Parse a specifications JSON string, or {} if it cannot be parsed."""
+    try:
+        return _loads(specs_str)
+    except Exception as e:
+        logger.warning(f"Error parsing specs JSON: {str(e)}")
+        return {}
+
+
+def _parse_pictures_literal(pictures_str):
+    """Parse a pictures list literal, or None if it is unparseable or empty."""
+    try:
+        # Pictures may be stored as a JSON or a Python list literal
+        parsed = ast.literal_eval(pictures_str)
+    except Exception as e:
+        logger.warning(f"Error parsing pictures JSON: {str(e)}")
+        return None
+    return parsed if isinstance(parsed, list) and len(parsed) > 0 else None
+
+
+def _flatten_specs(specs_dict):
+    """Index the top two levels of a specs dictionary by key.
+    
+    Each key maps to the list of values stored under it, top-level values first,
+    so a path lookup becomes a single dict probe instead of a nested scan.
+    """
+    flat = {}
+    for key, value in specs_dict.items():
+        flat.setdefault(key, []).append(value)
+    for value in specs_dict.values():
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                flat.setdefault(sub_key, []).append(sub_value)
+    return flat
+
+
 class DeviceAIAssistant:
     """AI Assistant for mobile device data search using direct CSV linking."""
     
@@ -30,6 +244,38 @@ class DeviceAIAssistant:
         
         # Load and process data
         self.unified_data = self._process_device_data()
+        
+        # Parsed specifications by row position, kept outside the DataFrame
+        self._specs = self._parse_specifications()
+        self._flat_specs = [_flatten_specs(specs) for specs in self._specs]
+        self._pictures = self._parse_pictures()
+        
+        # The raw JSON/literal columns are no longer needed once parsed
+        self.unified_data = self.unified_data.drop(columns=RAW_DATA_COLUMNS, errors='ignore')
+        
+        # Identifier fields of every row by position, read without pandas per request
+        self._records = list(
+            self.unified_data.reindex(columns=DEVICE_RECORD_COLUMNS, fill_value='')
+            .itertuples(index=False, name='DeviceRecord')
+        )
+        
+        # Rows repeating an earlier row, skipped when building recommendations
+        self._duplicate_rows = self.unified_data.duplicated().to_numpy()
+        
+        # Lowercase the name columns once instead of on every search
+        self._cache_lowercase_names()
+        
+        # Build the device name matcher once instead of scanning the data per query
+        self._device_automaton = self._build_device_automaton()
+        
+        # Repeated queries reuse the analysis of their normalized text
+        self._analyze_cached = functools.lru_cache(maxsize=2048)(self._analyze_normalized_query)
+        self._recommend_cached = functools.lru_cache(maxsize=256)(self._recommend_for_normalized_query)
+        
+        # Formatted device entries by row position, filled on first use
+        self._formatted_devices = {}
+        # Stringified comparison values by (row position, spec type), filled on first use
+        self._comparison_values = {}
         logger.info("AI Assistant initialized with direct CSV linking")
     
     def _process_device_data(self):
@@ -50,9 +296,12 @@ class DeviceAIAssistant:
         try:
             # Load brands_devices.csv (no header in file)
             # Format: Brand,DeviceName,DeviceURL,ImageURL
-            brands_df = pd.read_csv(self.device_data_path, header=None)
+            # The PyArrow engine parses the file in parallel; missing cells stay NaN as with the default engine
+            brands_df = pd.read_csv(self.device_data_path, header=None, engine='pyarrow')
             if len(brands_df.columns) >= 4:
                 brands_df.columns = ['brand_name', 'device_name', 'device_url', 'device_image']
+                # Brands repeat across many devices, so store them as categories
+                brands_df['brand_name'] = brands_df['brand_name'].astype('category')
                 logger.info(f"Loaded {len(brands_df)} devices from {self.device_data_path}")
             else:
                 logger.error(f"Unexpected format in {self.device_data_path}, needs 4 columns")
@@ -60,7 +309,7 @@ class DeviceAIAssistant:
             
             # Load device_specifications.csv with header
             # Format: device_url,full_device_name,pictures,specifications
-            specs_df = pd.read_csv(self.specs_data_path)
+            specs_df = pd.read_csv(self.specs_data_path, engine='pyarrow')
             if len(specs_df.columns) >= 4:
                 logger.info(f"Loaded {len(specs_df)} device specifications from {self.specs_data_path}")
             else:
@@ -71,26 +320,49 @@ class DeviceAIAssistant:
             unified_data = pd.merge(brands_df, specs_df, on='device_url', how='left')
             logger.info(f"Created unified data with {len(unified_data)} entries")
             
-            # Parse specifications JSON
-            def parse_specs(specs_str):
-                try:
-                    if pd.isna(specs_str):
-                        return {}
-                    return json.loads(specs_str)
-                except Exception as e:
-                    logger.warning(f"Error parsing specs JSON: {str(e)}")
-                    return {}
-            
-            # Parse specifications JSON
-            unified_data['specs_dict'] = unified_data['specifications'].apply(parse_specs)
-            
             return unified_data
         except Exception as e:
-            logger.error(f"Error processing device data: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.exception(f"Error processing device data: {str(e)}")
             # Return empty DataFrame with expected columns
             return pd.DataFrame(columns=['brand_name', 'device_name', 'device_url', 'device_image', 
-                                        'specifications', 'specs_dict'])
+                                        'specifications'])
+    
+    def _parse_specifications(self):
+        """Parse the specifications JSON of every device once.
+        
+        Returns:
+            NumPy object array holding one specs dict per row of unified_data
+        """
+        specs = np.empty(len(self.unified_data), dtype=object)
+        if 'specifications' in self.unified_data.columns:
+            specs_column = self.unified_data['specifications']
+            has_specs = specs_column.notna().to_numpy()
+            # Only rows that actually have specifications go through the JSON parser
+            specs[has_specs] = specs_column[has_specs].map(_parse_specs_json).to_numpy()
+        else:
+            has_specs = np.zeros(len(self.unified_data), dtype=bool)
+        
+        for position in np.flatnonzero(~has_specs):
+            specs[position] = {}
+        
+        return specs
+    
+    def _parse_pictures(self):
+        """Parse the pictures list literal of every device once.
+        
+        Returns:
+            NumPy object array holding the non-empty pictures list of each row,
+            or None where a row has no (parseable) pictures
+        """
+        pictures = np.full(len(self.unified_data), None, dtype=object)
+        if 'pictures' not in self.unified_data.columns:
+            return pictures
+        
+        pictures_column = self.unified_data['pictures']
+        has_pictures = pictures_column.notna().to_numpy()
+        pictures[has_pictures] = pictures_column[has_pictures].map(_parse_pictures_literal).to_numpy()
+        
+        return pictures
     
     def analyze_query_intent(self, query):
         """
@@ -102,14 +374,27 @@ class DeviceAIAssistant:
         Returns:
             dict: Analysis results containing intents, entities, and suggested action
         """
-        logger.info(f"Performing advanced intent analysis on query: {query}")
+        logger.info("Performing advanced intent analysis on query: {}", query)
         
         # Normalize query text
         query_text = query.lower().strip()
         
+        # Callers may modify the analysis, so hand out a copy of the cached one
+        analysis = copy.deepcopy(self._analyze_cached(query_text))
+        analysis["original_query"] = query
+        
+        logger.info("Query intent analysis complete. Primary intent: {}, Response type: {}", analysis['primary_intent'], analysis['response_type'])
+        
+        return analysis
+    
+    def _analyze_normalized_query(self, query_text):
+        """Analyze a normalized (lowercased, stripped) query.
+        
+        Only called through self._analyze_cached; see analyze_query_intent.
+        """
         # Initialize analysis structure
         analysis = {
-            "original_query": query,
+            "original_query": query_text,
             "normalized_query": query_text,
             "intents": {},
             "entities": {
@@ -140,13 +425,13 @@ class DeviceAIAssistant:
         for spec in requested_specs:
             analysis["entities"]["specifications"].append(spec)
         
+        # Match every intent keyword in a single pass over the query
+        keyword_hits = set(_iter_automaton(INTENT_AUTOMATON, query_text))
+        
         # Extract features of interest
-        for feature, keywords in FEATURE_KEYWORDS.items():
-            for keyword in keywords:
-                if keyword in query_text:
-                    if feature not in analysis["entities"]["features"]:
-                        analysis["entities"]["features"].append(feature)
-                    break
+        for feature in FEATURE_KEYWORDS:
+            if ('feature', feature) in keyword_hits:
+                analysis["entities"]["features"].append(feature)
         
         # Calculate intent confidence scores
         intent_scores = {}
@@ -156,20 +441,16 @@ class DeviceAIAssistant:
             intent_scores["device_search"] = 0.7
         
         # Recommendation intent
-        for keyword in RECOMMENDATION_KEYWORDS:
-            if keyword in query_text:
-                intent_scores["recommendation"] = 0.7
-                break
+        if RECOMMENDATION_RE.search(query_text):
+            intent_scores["recommendation"] = 0.7
         
         # Specification intent
         if analysis["entities"]["specifications"]:
             intent_scores["specification"] = 0.7
         
         # Comparison intent
-        for keyword in COMPARISON_KEYWORDS:
-            if keyword in query_text:
-                intent_scores["comparison"] = 0.7
-                break
+        if COMPARISON_RE.search(query_text):
+            intent_scores["comparison"] = 0.7
         
         # Feature-specific intents
         for feature in analysis["entities"]["features"]:
@@ -177,18 +458,9 @@ class DeviceAIAssistant:
                 intent_scores[feature] = 0.7
         
         # Simple intents
-        simple_intents = {
-            'greeting': ['hi', 'hello', 'hey', 'greetings'],
-            'farewell': ['bye', 'goodbye', 'see you'],
-            'thanks': ['thank you', 'thanks'],
-            'help': ['help', 'assist', 'how to use']
-        }
-        
-        for intent, keywords in simple_intents.items():
-            for keyword in keywords:
-                if keyword in query_text:
-                    intent_scores[intent] = 0.5
-                    break
+        for intent in SIMPLE_INTENTS:
+            if ('simple', intent) in keyword_hits:
+                intent_scores[intent] = 0.5
         
         # Default intent
         if not intent_scores:
@@ -218,56 +490,64 @@ class DeviceAIAssistant:
             # Default to conversational
             analysis["response_type"] = "conversation"
         
-        logger.info(f"Query intent analysis complete. Primary intent: {analysis['primary_intent']}, Response type: {analysis['response_type']}")
-        
         return analysis
     
     def _log_intent_analysis(self, analysis):
         """
         Log the query intent analysis in a formatted, easy-to-read way.
         
+        The report is written as a single log record and only built when a
+        handler accepts INFO messages.
+        
         Args:
             analysis: The analysis dictionary returned by analyze_query_intent
         """
-        logger.info("===== QUERY INTENT ANALYSIS =====")
-        logger.info(f"Original query: '{analysis['original_query']}'")
-        logger.info(f"Primary intent: {analysis['primary_intent']} (confidence: {analysis['confidence_score']:.2f})")
+        logger.opt(lazy=True).info("{}", lambda: self._format_intent_analysis(analysis))
+    
+    def _format_intent_analysis(self, analysis):
+        """Render the query intent analysis as the multi-line log report."""
+        lines = [
+            "===== QUERY INTENT ANALYSIS =====",
+            f"Original query: '{analysis['original_query']}'",
+            f"Primary intent: {analysis['primary_intent']} (confidence: {analysis['confidence_score']:.2f})"
+        ]
         
         if analysis.get('secondary_intent'):
-            logger.info(f"Secondary intent: {analysis['secondary_intent']}")
+            lines.append(f"Secondary intent: {analysis['secondary_intent']}")
         
-        logger.info(f"Response type: {analysis['response_type']}")
+        lines.append(f"Response type: {analysis['response_type']}")
         
-        # Log all detected intents with scores
+        # All detected intents with scores
         if analysis['intents']:
-            logger.info("Detected intents (ordered by confidence):")
+            lines.append("Detected intents (ordered by confidence):")
             for intent, score in analysis['intents'].items():
-                logger.info(f"  - {intent}: {score:.2f}")
+                lines.append(f"  - {intent}: {score:.2f}")
         
-        # Log entities
+        # Entities
         if analysis['entities']['devices']:
-            logger.info("Detected devices:")
+            lines.append("Detected devices:")
             for device in analysis['entities']['devices']:
                 if isinstance(device, dict) and 'full_name' in device:
-                    logger.info(f"  - {device['full_name']}")
+                    lines.append(f"  - {device['full_name']}")
                 elif isinstance(device, dict) and 'type' in device:
-                    logger.info(f"  - Device type: {device['type']}")
+                    lines.append(f"  - Device type: {device['type']}")
         
         if analysis['entities']['brands']:
-            logger.info(f"Detected brands: {', '.join(analysis['entities']['brands'])}")
+            lines.append(f"Detected brands: {', '.join(analysis['entities']['brands'])}")
         
         if analysis['entities']['features']:
-            logger.info(f"Detected features: {', '.join(analysis['entities']['features'])}")
+            lines.append(f"Detected features: {', '.join(analysis['entities']['features'])}")
         
         if analysis['entities']['specifications']:
-            logger.info(f"Requested specifications: {', '.join(analysis['entities']['specifications'])}")
+            lines.append(f"Requested specifications: {', '.join(analysis['entities']['specifications'])}")
         
-        logger.info("==================================")
+        lines.append("==================================")
+        return "\n".join(lines)
     
     def handle_conversation(self, user_input):
         """Handle conversation input with advanced intent analysis and targeted responses."""
         # Log the query
-        logger.info(f"Processing query: {user_input}")
+        logger.info("Processing query: {}", user_input)
         
         # Perform comprehensive query analysis
         query_analysis = self.analyze_query_intent(user_input)
@@ -295,23 +575,25 @@ class DeviceAIAssistant:
         # Handle different response types based on the analysis
         if response_type == "comparison" and len(device_names) >= 2:
             # Handle device comparison
-            logger.info(f"Handling comparison between devices: {device_names}")
+            logger.info("Handling comparison between devices: {}", device_names)
             return self.compare_devices(user_input)
             
         elif response_type == "device_specs" and device_names:
             # Get device info with specific specs highlighted
             devices_df = self._search_devices_by_name(device_names)
             if not devices_df.empty:
-                device_info = self._format_device_data(devices_df.iloc[0])
+                device_row = devices_df.iloc[0]
+                device_info = self._format_device_data(device_row)
                 # Extract requested specs
                 if specs and 'specifications' in device_info:
                     requested_specs = self._extract_requested_specs(
                         device_info['specifications'],
-                        specs
+                        specs,
+                        self._flat_specs[device_row.name]
                     )
                     return self._generate_spec_response(device_info, specs, requested_specs)
             else:
-                logger.info(f"No device found matching names: {device_names}")
+                logger.info("No device found matching names: {}", device_names)
                 return FALLBACK_RESPONSES['no_device_found']
                 
         elif response_type == "device_details" and device_names:
@@ -321,7 +603,7 @@ class DeviceAIAssistant:
                 device_info = self._format_device_data(devices_df.iloc[0])
                 return self._generate_general_device_response(device_info)
             else:
-                logger.info(f"No device found matching names: {device_names}")
+                logger.info("No device found matching names: {}", device_names)
                 return FALLBACK_RESPONSES['no_device_found']
                 
         elif response_type == "recommendations":
@@ -338,7 +620,7 @@ class DeviceAIAssistant:
                 else:
                     message = DEVICE_TEMPLATES['recommendation_intro']
                 
-                logger.info(f"Returning {len(recommendations)} recommendations with message: {message}")
+                logger.info("Returning {} recommendations with message: {}", len(recommendations), message)
                 return {
                     'type': 'recommendations',
                     'devices': recommendations,
@@ -353,22 +635,17 @@ class DeviceAIAssistant:
             # Get specific feature details for a device
             devices_df = self._search_devices_by_name(device_names)
             if not devices_df.empty:
-                device_info = self._format_device_data(devices_df.iloc[0])
+                device_row = devices_df.iloc[0]
+                device_info = self._format_device_data(device_row)
                 
                 # Map features to spec categories
-                feature_to_spec = {
-                    "camera": ["camera", "main_camera", "selfie_camera"],
-                    "battery": ["battery", "battery_life", "charging"],
-                    "performance": ["processor", "cpu", "chipset", "platform"],
-                    "display": ["display", "screen"]
-                }
-                
-                if primary_intent in feature_to_spec:
+                if primary_intent in FEATURE_SPEC_TYPES:
                     requested_specs = self._extract_requested_specs(
                         device_info.get('specifications', {}),
-                        feature_to_spec[primary_intent]
+                        FEATURE_SPEC_TYPES[primary_intent],
+                        self._flat_specs[device_row.name]
                     )
-                    return self._generate_spec_response(device_info, feature_to_spec[primary_intent], requested_specs)
+                    return self._generate_spec_response(device_info, FEATURE_SPEC_TYPES[primary_intent], requested_specs)
                 else:
                     return self._generate_general_device_response(device_info)
             else:
@@ -385,263 +662,292 @@ class DeviceAIAssistant:
         # For conversation and other intents, use the standard category-based approach
         return self._get_response_for_category(primary_intent, user_input)
     
-    def _extract_device_names(self, query):
-        """Extract potential device names from the query."""
-        device_names = []
+    def _cache_lowercase_names(self):
+        """Cache lowercased brand, device and full names of every row.
+        
+        The arrays feed the exact (brand, device) name index and the fuzzy
+        match choices, the string frame serves partial (regex) matching.
+        """
+        if {'brand_name', 'device_name'}.issubset(self.unified_data.columns):
+            brand_lower = self.unified_data['brand_name'].str.lower().fillna('').to_numpy(dtype=object)
+            device_lower = self.unified_data['device_name'].str.lower().fillna('').to_numpy(dtype=object)
+        else:
+            brand_lower = np.empty(len(self.unified_data), dtype=object)
+            device_lower = np.empty(len(self.unified_data), dtype=object)
         
-        # Create a list of all brand and device name combinations
+        self._brand_lower = brand_lower
+        self._device_lower = device_lower
+        self._full_lower = np.array(
+            [f"{brand} {device}" for brand, device in zip(brand_lower, device_lower)], dtype=object
+        )
+        self._lower_names = pd.DataFrame({
+            'device': self._device_lower,
+            'full': self._full_lower
+        }, dtype='string')
+        
+        # Row positions of every (brand, device) pair for exact name lookups
+        self._name_index = {}
+        for position, key in enumerate(zip(self._brand_lower, self._device_lower)):
+            self._name_index.setdefault(key, []).append(position)
+        
+        # Row positions of every brand for brand filtering
+        self._brand_positions = {}
+        for position, brand in enumerate(self._brand_lower):
+            self._brand_positions.setdefault(brand, []).append(position)
+    
+    def _build_device_automaton(self):
+        """Build an Aho-Corasick automaton over all brand + device name combinations.
+        
+        Each name maps to (rank, brand, device) entries, where rank orders matches
+        longest name first, the same order the previous linear scan used.
+        """
         all_devices = []
-        for _, row in self.unified_data.iterrows():
-            brand = row.get('brand_name', '').lower()
-            device = row.get('device_name', '').lower()
+        for full_name, brand, device in zip(self._full_lower, self._brand_lower, self._device_lower):
             # Add full name (brand + device)
-            all_devices.append({
-                'full_name': f"{brand} {device}",
-                'brand': brand,
-                'device': device
-            })
+            all_devices.append((full_name, brand, device))
             # Also add just device name for cases where brand isn't mentioned
-            all_devices.append({
-                'full_name': device,
-                'brand': brand,
-                'device': device
-            })
+            all_devices.append((device, brand, device))
         
         # Sort by length (descending) to match longest names first
-        all_devices.sort(key=lambda x: len(x['full_name']), reverse=True)
+        all_devices.sort(key=lambda x: len(x[0]), reverse=True)
         
-        # Convert query to lowercase for matching
-        query_lower = query.lower()
+        return _build_automaton(
+            (full_name, (rank, brand, device))
+            for rank, (full_name, brand, device) in enumerate(all_devices)
+        )
+    
+    def _find_mentioned_device(self, text):
+        """Find the first device whose brand and device name both occur in text.
         
-        # Find matches in query
-        for device_info in all_devices:
-            if device_info['full_name'] in query_lower:
-                # Avoid duplicate additions
-                if not any(d['device'] == device_info['device'] and d['brand'] == device_info['brand'] for d in device_names):
-                    device_names.append({
-                        'brand': device_info['brand'],
-                        'device': device_info['device']
-                    })
+        Brand and device may appear anywhere in the lowercased text; as with the
+        former row-by-row scan, the earliest matching row wins.
+        
+        Returns:
+            (brand, device) lowercased, or None if no device is mentioned
+        """
+        first = None
+        for _, brand, device in _iter_automaton(self._device_automaton, text):
+            if brand in text:
+                position = self._name_index[(brand, device)][0]
+                if first is None or position < first[0]:
+                    first = (position, brand, device)
+        
+        return first[1:] if first else None
+    
+    def _extract_device_names(self, query):
+        """Extract potential device names from the query."""
+        # Find all device names contained in the query in a single pass
+        matches = sorted(_iter_automaton(self._device_automaton, query.lower()))
+        
+        device_names = []
+        seen = set()
+        for _, brand, device in matches:
+            # Avoid duplicate additions
+            if (brand, device) in seen:
+                continue
+            seen.add((brand, device))
+            device_names.append({
+                'brand': brand,
+                'device': device
+            })
         
         return device_names
     
     def _extract_specification_requests(self, query):
         """Extract requested specifications from query."""
-        query_lower = query.lower()
-        
-        # Common specification keywords to look for
-        spec_keywords = {
-            'battery': ['battery', 'battery capacity', 'battery life', 'charge', 'charging'],
-            'camera': ['camera', 'megapixel', 'mp', 'photo', 'selfie', 'front camera', 'rear camera'],
-            'display': ['display', 'screen', 'resolution', 'refresh rate', 'hz', 'amoled', 'lcd', 'oled'],
-            'processor': ['processor', 'cpu', 'chipset', 'snapdragon', 'exynos', 'mediatek', 'tensor'],
-            'memory': ['memory', 'ram', 'storage', 'gb', 'tb'],
-            'dimensions': ['dimensions', 'size', 'width', 'height', 'weight'],
-            'os': ['os', 'android', 'ios', 'operating system', 'software'],
-            'price': ['price', 'cost', 'value', 'dollars', 'expensive', 'cheap']
-        }
-        
-        # Track which specifications were requested
-        requested_specs = []
+        # Find all specification keywords in one regex pass
+        found = {SPEC_KEYWORD_TYPES[keyword] for keyword in SPEC_KEYWORD_PATTERN.findall(query.lower())}
         
-        # Check for each specification type
-        for spec_type, keywords in spec_keywords.items():
-            for keyword in keywords:
-                if keyword in query_lower:
-                    requested_specs.append(spec_type)
-                    break  # Once we find one keyword for this spec type, move to next
-        
-        return requested_specs
+        # Keep the specification types in their declared order
+        return [spec_type for spec_type in SPEC_KEYWORDS if spec_type in found]
     
     def _search_devices_by_name(self, device_names):
         """Search for devices using extracted device names."""
         if not device_names:
             return pd.DataFrame()
         
-        # Build filter mask for each device
-        all_masks = []
+        return self.unified_data.iloc[self._search_device_positions(device_names)]
+    
+    def _search_device_positions(self, device_names):
+        """Row positions of the devices matching the extracted device names.
+        
+        Exact (brand, device) matches come back in data order; without any,
+        the top 10 fuzzy matches on the full names of the devices whose brand
+        contains the requested brand, best first.
+        """
+        # Look up the rows matching each brand and device name exactly
+        positions = set()
         for device_info in device_names:
             brand = device_info.get('brand', '').lower()
             device = device_info.get('device', '').lower()
-            
-            # Match by brand and device name
-            mask = (
-                self.unified_data['brand_name'].str.lower() == brand
-            ) & (
-                self.unified_data['device_name'].str.lower() == device
-            )
-            
-            all_masks.append(mask)
-        
-        # Combine all masks with OR logic
-        final_mask = all_masks[0]
-        for mask in all_masks[1:]:
-            final_mask = final_mask | mask
+            positions.update(self._name_index.get((brand, device), ()))
         
-        matching_devices = self.unified_data[final_mask]
+        if positions:
+            return sorted(positions)
         
-        if len(matching_devices) > 0:
-            return matching_devices
-        
-        # If no exact matches, try partial matches
-        all_masks = []
+        # If no exact matches, try fuzzy matches on the full names within the brand
+        best_scores = {}
         for device_info in device_names:
             brand = device_info.get('brand', '').lower()
-            device = device_info.get('device', '').lower()
-            
-            # Match by partial brand and device name
-            mask = (
-                self.unified_data['brand_name'].str.lower().str.contains(brand, na=False)
-            ) & (
-                self.unified_data['device_name'].str.lower().str.contains(device, na=False)
-            )
-            
-            all_masks.append(mask)
-        
-        # Combine all masks with OR logic
-        final_mask = all_masks[0]
-        for mask in all_masks[1:]:
-            final_mask = final_mask | mask
+            name = f"{brand} {device_info.get('device', '').lower()}"
+            choices = {
+                position: self._full_lower[position]
+                for brand_lower, brand_positions in self._brand_positions.items()
+                if brand in brand_lower
+                for position in brand_positions
+            }
+            for _, score, position in process.extract(
+                name, choices, scorer=fuzz.partial_ratio, limit=10, score_cutoff=70
+            ):
+                best_scores[position] = max(score, best_scores.get(position, 0))
         
-        return self.unified_data[final_mask].head(10)  # Limit to top 10 matches
+        # Best matches first, limited to top 10 matches
+        return sorted(best_scores, key=lambda position: (-best_scores[position], position))[:10]
     
     def _search_by_exact_match(self, query):
         """Search for devices by exact name match."""
         query = query.lower()
         
         # Try exact match on device name
-        exact_matches = self.unified_data[
-            self.unified_data['device_name'].str.lower().str.contains(query, na=False) |
-            (self.unified_data['brand_name'].str.lower() + " " + self.unified_data['device_name'].str.lower()).str.contains(query, na=False)
-        ]
+        mask = (
+            self._lower_names['device'].str.contains(query, na=False) |
+            self._lower_names['full'].str.contains(query, na=False)
+        )
+        exact_matches = self.unified_data[mask.to_numpy(dtype=bool)]
         
         if len(exact_matches) > 0:
             return exact_matches.head(10)  # Limit to top 10 matches
         
         return pd.DataFrame()  # No matches
     
-    def _extract_requested_specs(self, specs_dict, requested_specs):
-        """Extract requested specifications from the full specs dictionary."""
+    def _extract_requested_specs(self, specs_dict, requested_specs, flat_specs=None):
+        """Extract requested specifications from the full specs dictionary.
+        
+        Args:
+            specs_dict: Parsed specifications of the device
+            requested_specs: Specification types to extract (keys of SPEC_PATHS)
+            flat_specs: Precomputed _flatten_specs(specs_dict), if available
+        """
         if not specs_dict or not requested_specs:
             return {}
-            
-        result = {}
         
-        # Map requested spec categories to relevant paths in specs dictionary
-        spec_mapping = {
-            'battery': ['battery', 'Battery', 'battery_type', 'battery life', 'charging'],
-            'camera': ['main_camera', 'selfie_camera', 'Main Camera', 'Selfie camera'],
-            'display': ['display', 'Display', 'display_type', 'resolution'],
-            'processor': ['platform', 'Platform', 'cpu', 'chipset', 'gpu'],
-            'memory': ['memory', 'Memory', 'internal', 'ram'],
-            'dimensions': ['dimensions', 'body', 'Body', 'weight'],
-            'os': ['os', 'platform', 'Platform'],
-            'price': ['price', 'price_info', 'Misc']
-        }
+        if flat_specs is None:
+            flat_specs = _flatten_specs(specs_dict)
         
-        # Track added keys to prevent duplicates
+        result = {}
+        
+        # Track added keys (lowercased) to prevent duplicates
         added_keys = set()
         
-        # For each requested spec, try to find it in the specs dictionary
-        for spec_type in requested_specs:
-            if spec_type in spec_mapping:
-                # Initialize result for this spec type if not already present
-                if spec_type not in result:
-                    result[spec_type] = {}
-                
-                # Try each possible path for this spec type
-                for path in spec_mapping[spec_type]:
-                    # Look for the path in the top level
-                    if path in specs_dict:
-                        # If it's a dictionary, add all its contents that haven't been added yet
-                        if isinstance(specs_dict[path], dict):
-                            for key, value in specs_dict[path].items():
-                                # Check for similar keys that might already be added with different casing
-                                key_lower = key.lower()
-                                if not any(k.lower() == key_lower for k in added_keys):
-                                    result[spec_type][key] = value
-                                    added_keys.add(key)
-                        else:
-                            # If it's a string or other value, add it directly if not already added
-                            path_lower = path.lower()
-                            if not any(k.lower() == path_lower for k in added_keys):
-                                result[spec_type][path] = specs_dict[path]
-                                added_keys.add(path)
-                    
-                    # Also check in nested dictionaries
-                    for key, value in specs_dict.items():
-                        if isinstance(value, dict) and path in value:
-                            if isinstance(value[path], dict):
-                                for sub_key, sub_value in value[path].items():
-                                    # Check if similar key already exists
-                                    sub_key_lower = sub_key.lower()
-                                    if not any(k.lower() == sub_key_lower for k in added_keys):
-                                        result[spec_type][sub_key] = sub_value
-                                        added_keys.add(sub_key)
-                            else:
-                                # Skip if a similar key is already present
-                                path_lower = path.lower()
-                                if not any(k.lower() == path_lower for k in added_keys):
-                                    result[spec_type][path] = value[path]
-                                    added_keys.add(path)
+        # For each requested spec, look up each of its paths in the flat index
+        for spec_type, paths in _resolve_spec_plan(tuple(requested_specs)):
+            # Initialize result for this spec type if not already present
+            spec_result = result.setdefault(spec_type, {})
+            
+            for path, path_lower in paths:
+                for value in flat_specs.get(path, ()):
+                    if isinstance(value, dict):
+                        # Add all its contents that haven't been added yet
+                        for key, sub_value in value.items():
+                            key_lower = key.lower()
+                            if key_lower not in added_keys:
+                                spec_result[key] = sub_value
+                                added_keys.add(key_lower)
+                    elif path_lower not in added_keys:
+                        # If it's a string or other value, add it directly
+                        spec_result[path] = value
+                        added_keys.add(path_lower)
         
         return result
     
     def _format_device_data(self, device_data):
         """Format device data for API response."""
+        # Rows of unified_data are labelled by their position; anything else
+        # (a dict, a row of another frame) is formatted from its own fields
+        position = getattr(device_data, 'name', None)
+        if (
+            isinstance(position, (int, np.integer))
+            and 0 <= position < len(self._records)
+            and self._records[position].device_name == device_data.get('device_name')
+        ):
+            return self._format_device_at(position)
+        return self._format_device_fields(device_data)
+    
+    def _format_device_at(self, position):
+        """Format the device at the given row position for API response."""
+        formatted_device = self._formatted_devices.get(position)
+        if formatted_device is None:
+            formatted_device = self._format_device_uncached(position)
+            if 'error' in formatted_device:
+                return formatted_device
+            self._formatted_devices[position] = formatted_device
+        
+        # Callers add their own fields, so hand out a copy of the cached entry
+        return dict(formatted_device)
+    
+    def _format_device_uncached(self, position):
+        """Build the formatted entry of the device at the given row position."""
         try:
-            formatted_device = {
-                'brand_name': device_data.get('brand_name', ''),
-                'device_name': device_data.get('device_name', ''),
-                'device_url': device_data.get('device_url', ''),
-                'device_image': device_data.get('device_image', '')
-            }
-            
-            # Add full name
-            formatted_device['name'] = f"{formatted_device['brand_name']} {formatted_device['device_name']}"
-            
-            # For URL compatibility
-            formatted_device['url'] = formatted_device['device_url']
-            formatted_device['image_url'] = formatted_device['device_image']
+            # The cached record and parsed columns replace per-field lookups on a row Series
+            return self._build_formatted_device(
+                self._records[position]._asdict(), self._pictures[position], self._specs[position]
+            )
+        except Exception as e:
+            logger.error(f"Error formatting device data: {str(e)}")
+            return {'error': str(e)}
+    
+    def _format_device_fields(self, device_data):
+        """Format a device from the fields of a dict or Series, parsing them as needed."""
+        try:
+            identifiers = {column: device_data.get(column, '') for column in DEVICE_RECORD_COLUMNS}
             
-            # Add image from pictures if available
-            if 'pictures' in device_data and not pd.isna(device_data['pictures']):
-                try:
-                    pictures_str = device_data['pictures']
-                    if isinstance(pictures_str, str):
-                        pictures = json.loads(pictures_str.replace("'", '"'))
-                        if isinstance(pictures, list) and len(pictures) > 0:
-                            formatted_device['pictures'] = pictures
-                    elif isinstance(pictures_str, list):
-                        formatted_device['pictures'] = pictures_str
-                except Exception as e:
-                    logger.warning(f"Error parsing pictures JSON: {str(e)}")
-                    # If we can't parse it, try to convert it to a string
-                    if isinstance(device_data['pictures'], (list, dict)):
-                        try:
-                            formatted_device['pictures'] = [str(p) for p in device_data['pictures'] if p]
-                        except:
-                            pass
+            pictures = device_data.get('pictures')
+            if isinstance(pictures, str):
+                pictures = _parse_pictures_literal(pictures)
+            elif not isinstance(pictures, list) or len(pictures) == 0:
+                pictures = None
             
-            # Add specifications
-            if 'specs_dict' in device_data:
-                specs = {}
-                if isinstance(device_data['specs_dict'], dict):
-                    specs = device_data['specs_dict']
-                # Ensure all values are serializable
-                for key, value in specs.items():
-                    if isinstance(value, pd.Series) or hasattr(value, 'to_dict'):
-                        specs[key] = value.to_dict() if hasattr(value, 'to_dict') else {str(k): str(v) for k, v in value.items()}
-                
-                # Log the structure of the specs_dict
-                logger.info(f"Specs structure for {device_data.get('device_name', 'unknown device')}: {list(specs.keys())}")
-                formatted_device['specifications'] = specs
+            specs = device_data.get('specs_dict')
+            if not isinstance(specs, dict):
+                specs_str = device_data.get('specifications')
+                specs = _parse_specs_json(specs_str) if isinstance(specs_str, str) else None
             
-            return formatted_device
+            return self._build_formatted_device(identifiers, pictures, specs)
         except Exception as e:
             logger.error(f"Error formatting device data: {str(e)}")
             return {'error': str(e)}
     
+    def _build_formatted_device(self, formatted_device, pictures, specs):
+        """Complete a dict of the DEVICE_RECORD_COLUMNS fields for API response.
+        
+        pictures and specs are already parsed; None leaves the entry out.
+        """
+        # Add full name
+        formatted_device['name'] = f"{formatted_device['brand_name']} {formatted_device['device_name']}"
+        
+        # For URL compatibility
+        formatted_device['url'] = formatted_device['device_url']
+        formatted_device['image_url'] = formatted_device['device_image']
+        
+        # Add pictures, if available
+        if pictures is not None:
+            formatted_device['pictures'] = pictures
+        
+        # Add specifications, if available
+        if specs is not None:
+            # Ensure all values are serializable
+            for key, value in specs.items():
+                if isinstance(value, pd.Series) or hasattr(value, 'to_dict'):
+                    specs[key] = value.to_dict() if hasattr(value, 'to_dict') else {str(k): str(v) for k, v in value.items()}
+            
+            # Log the structure of the specifications
+            logger.opt(lazy=True).info(
+                "Specs structure for {}: {}", lambda: formatted_device['device_name'], lambda: list(specs.keys())
+            )
+            formatted_device['specifications'] = specs
+        
+        return formatted_device
+    
     def _generate_spec_response(self, device_info, requested_specs, spec_data):
         """Generate a response about specific device specifications."""
         device_name = f"{device_info.get('brand_name', '')} {device_info.get('device_name', '')}"
@@ -649,94 +955,96 @@ class DeviceAIAssistant:
         if not spec_data:
             return FALLBACK_RESPONSES['no_specs_found']
         
-        # Start with device name
-        response = DEVICE_TEMPLATES['spec_intro'].format(
+        # Start with device name; collect the parts and join them once
+        parts = [DEVICE_TEMPLATES['spec_intro'].format(
             specs=', '.join(requested_specs),
             device_name=device_name
-        ) + "\n\n"
+        ), "\n\n"]
         
         # Add each requested spec
         for spec_type, data in spec_data.items():
-            response += f"• {spec_type.capitalize()}:\n"
+            parts.append(f"• {spec_type.capitalize()}:\n")
             for key, value in data.items():
                 # Format the key for better readability
                 readable_key = key.replace('_', ' ').title()
                 if isinstance(value, dict):
-                    response += f"  - {readable_key}: "
-                    for sub_key, sub_value in value.items():
-                        sub_readable_key = sub_key.replace('_', ' ').title()
-                        response += f"{sub_readable_key}: {sub_value}, "
-                    response = response.rstrip(', ') + "\n"
+                    sub_items = ', '.join(
+                        f"{sub_key.replace('_', ' ').title()}: {sub_value}"
+                        for sub_key, sub_value in value.items()
+                    )
+                    parts.append(f"  - {readable_key}: {sub_items}".rstrip(', ') + "\n")
                 else:
-                    response += f"  - {readable_key}: {value}\n"
-            response += "\n"
+                    parts.append(f"  - {readable_key}: {value}\n")
+            parts.append("\n")
         
-        return response.strip()
+        return ''.join(parts).strip()
     
     def _generate_general_device_response(self, device_info):
         """Generate a general response about a device."""
         device_name = f"{device_info.get('brand_name', '')} {device_info.get('device_name', '')}"
         
-        response = DEVICE_TEMPLATES['found_device'].format(
+        parts = [DEVICE_TEMPLATES['found_device'].format(
             brand_name=device_info.get('brand_name', ''),
             device_name=device_info.get('device_name', '')
-        )
+        )]
         
         # Add some basic specs if available
         specs = device_info.get('specifications', {})
         highlights = []
         
         # Look for display information
-        if 'display' in specs or 'Display' in specs:
-            display_info = specs.get('display', specs.get('Display', {}))
-            if isinstance(display_info, dict):
-                size = display_info.get('size', '')
-                if size:
-                    highlights.append(f"It has a {size} display")
+        display_info = _first_present(specs, 'display', 'Display')
+        if isinstance(display_info, dict):
+            size = display_info.get('size', '')
+            if size:
+                highlights.append(f"It has a {size} display")
         
         # Look for processor information
-        if 'platform' in specs or 'Platform' in specs:
-            platform_info = specs.get('platform', specs.get('Platform', {}))
-            if isinstance(platform_info, dict):
-                chipset = platform_info.get('chipset', '')
-                if chipset:
-                    highlights.append(f"It's powered by a {chipset}")
+        platform_info = _first_present(specs, 'platform', 'Platform')
+        if isinstance(platform_info, dict):
+            chipset = platform_info.get('chipset', '')
+            if chipset:
+                highlights.append(f"It's powered by a {chipset}")
         
         # Look for camera information
-        if 'main_camera' in specs or 'Main Camera' in specs:
-            camera_info = specs.get('main_camera', specs.get('Main Camera', {}))
-            if isinstance(camera_info, dict) and 'modules' in camera_info:
-                highlights.append(f"The main camera is {camera_info['modules']}")
-            elif isinstance(camera_info, str):
-                highlights.append(f"The main camera is {camera_info}")
+        camera_info = _first_present(specs, 'main_camera', 'Main Camera')
+        if isinstance(camera_info, dict) and 'modules' in camera_info:
+            highlights.append(f"The main camera is {camera_info['modules']}")
+        elif isinstance(camera_info, str):
+            highlights.append(f"The main camera is {camera_info}")
         
         # Look for battery information
+        battery_info = specs.get('battery')
         if 'battery_type' in specs:
             highlights.append(f"It has a {specs['battery_type']}")
-        elif 'battery' in specs and isinstance(specs['battery'], dict) and 'type' in specs['battery']:
-            highlights.append(f"It has a {specs['battery']['type']}")
+        elif isinstance(battery_info, dict) and 'type' in battery_info:
+            highlights.append(f"It has a {battery_info['type']}")
         
         # Add the highlights to the response
         if highlights:
-            response += " " + ". ".join(highlights) + "."
+            parts.append(" " + ". ".join(highlights) + ".")
         
         # Ask if the user wants more information
-        response += " Would you like to know more specific information about this device?"
+        parts.append(" Would you like to know more specific information about this device?")
         
-        return response
+        return ''.join(parts)
     
     def _categorize_input(self, user_input):
         """Categorize user input into predefined categories using pattern matching."""
         user_input = user_input.lower()
         
-        logger.info(f"Categorizing input: {user_input}")
+        logger.info("Categorizing input: {}", user_input)
+        
+        # Match every categorization keyword in a single pass over the input
+        keyword_hits = set(_iter_automaton(CATEGORY_AUTOMATON, user_input))
+        has_recommendation = ('recommendation', None) in keyword_hits
         
         # Check for direct device type references
         for device_type in DEVICE_TYPES:
-            if device_type in user_input:
-                logger.info(f"Detected device type reference: {device_type}")
+            if ('device_type', device_type) in keyword_hits:
+                logger.info("Detected device type reference: {}", device_type)
                 # If it also contains a recommendation keyword, it's likely a recommendation request
-                if any(keyword in user_input for keyword in RECOMMENDATION_KEYWORDS):
+                if has_recommendation:
                     logger.info("Categorized as recommendation based on device type + recommendation keywords")
                     return 'recommendation'
                 # Otherwise it's likely a general device search
@@ -745,78 +1053,50 @@ class DeviceAIAssistant:
         
         # Check for brand references
         for brand in POPULAR_BRANDS:
-            if brand in user_input:
-                logger.info(f"Detected brand reference: {brand}")
+            if ('brand', brand) in keyword_hits:
+                logger.info("Detected brand reference: {}", brand)
                 # If we also have recommendation keywords, it's likely a brand-specific recommendation
-                if any(keyword in user_input for keyword in RECOMMENDATION_KEYWORDS):
+                if has_recommendation:
                     logger.info("Categorized as recommendation based on brand + recommendation keywords")
                     return 'recommendation'
         
         # Check for comparison intent
-        if any(keyword in user_input for keyword in COMPARISON_KEYWORDS):
+        if ('comparison', None) in keyword_hits:
             logger.info("Categorized as comparison based on comparison keywords")
             return 'comparison'
         
         # Check for specification intent
-        if any(keyword in user_input for keyword in SPECIFICATION_KEYWORDS):
+        if ('specification', None) in keyword_hits:
             logger.info("Categorized as specification based on specification keywords")
             return 'specification'
         
-        # Check for feature-specific queries
-        for feature, keywords in FEATURE_KEYWORDS.items():
-            if any(keyword in user_input for keyword in keywords):
-                logger.info(f"Detected feature reference: {feature}")
-                # If it's a price feature, categorize as price
-                if feature == 'price':
-                    logger.info("Categorized as price based on price keywords")
-                    return 'price'
-                # If it's a camera feature, categorize as camera
-                elif feature == 'camera':
-                    logger.info("Categorized as camera based on camera keywords")
-                    return 'camera'
-                # If it's a battery feature, categorize as battery
-                elif feature == 'battery':
-                    logger.info("Categorized as battery based on battery keywords")
-                    return 'battery'
-                # If it's a performance feature, categorize as performance
-                elif feature == 'performance':
-                    logger.info("Categorized as performance based on performance keywords")
-                    return 'performance'
-                # If it's a display feature, categorize as display
-                elif feature == 'display':
-                    logger.info("Categorized as display based on display keywords")
-                    return 'display'
-        
-        # Define simple keyword-based categories
-        categories = {
-            'greeting': ['hi', 'hello', 'hey', 'greetings', 'good morning', 'good afternoon', 'good evening'],
-            'farewell': ['bye', 'goodbye', 'see you', 'talk to you later'],
-            'thanks': ['thank you', 'thanks', 'appreciate it'],
-            'identity': ['who are you', 'what are you', 'your name', 'about you'],
-            'help': ['help', 'assist', 'guidance', 'how to use', 'what can you do', 'capabilities']
-        }
+        # Check for feature-specific queries (price, camera, battery, performance, display)
+        for feature in FEATURE_KEYWORDS:
+            if ('feature', feature) in keyword_hits:
+                logger.info("Detected feature reference: {}", feature)
+                if feature in CATEGORIZED_FEATURES:
+                    logger.info("Categorized as {0} based on {0} keywords", feature)
+                    return feature
         
         # Check for recommendation intent (this is important enough to check separately)
-        if any(keyword in user_input for keyword in RECOMMENDATION_KEYWORDS):
+        if has_recommendation:
             logger.info("Categorized as recommendation based on recommendation keywords")
             return 'recommendation'
         
         # Check for other simple categories
-        for category, keywords in categories.items():
+        for category, keywords in CONVERSATION_CATEGORIES.items():
             for keyword in keywords:
-                if keyword in user_input:
-                    logger.info(f"Categorized as: {category} based on keyword: {keyword}")
+                if ('category', keyword) in keyword_hits:
+                    logger.info("Categorized as: {} based on keyword: {}", category, keyword)
                     return category
         
         # Check for specific device references
-        for _, row in self.unified_data.iterrows():
-            brand_name = row.get('brand_name', '').lower()
-            device_name = row.get('device_name', '').lower()
-            
+        mentioned_device = self._find_mentioned_device(user_input)
+        if mentioned_device:
             # If both brand and device name are in the query, it's probably a device search
-            if brand_name in user_input and device_name in user_input:
-                logger.info(f"Categorized as device_search for device: {brand_name} {device_name}")
-                return 'device_search'
+            brand_name, device_name = mentioned_device
+            logger.info("Categorized as device_search for device: {} {}", brand_name, device_name)
+            return 'device_search'
         
         # Default category
         logger.info("No specific category found, using 'general'")
@@ -824,13 +1104,16 @@ class DeviceAIAssistant:
     
     def _get_response_for_category(self, category, user_input):
         """Get a hardcoded response based on the category."""
+        # Lowercase once for all keyword and device checks below
+        user_input_lower = user_input.lower()
+        
         # Check for recommendation keywords and return a more helpful message
-        if any(keyword in user_input.lower() for keyword in RECOMMENDATION_KEYWORDS):
-            logger.info(f"Recommendation request in _get_response_for_category: {user_input}")
+        if ('recommendation', None) in set(_iter_automaton(CATEGORY_AUTOMATON, user_input_lower)):
+            logger.info("Recommendation request in _get_response_for_category: {}", user_input)
             # Force recommendations if we somehow end up here with a recommendation request
             recommendations = self.get_device_recommendations(user_input)
             if recommendations:
-                logger.info(f"Returning {len(recommendations)} recommendations from _get_response_for_category")
+                logger.info("Returning {} recommendations from _get_response_for_category", len(recommendations))
                 return {
                     'type': 'recommendations',
                     'devices': recommendations,
@@ -840,16 +1123,14 @@ class DeviceAIAssistant:
                 return FALLBACK_RESPONSES['no_recommendations']
         
         # First check if the input mentions a specific device
-        for _, row in self.unified_data.iterrows():
-            brand_name = row.get('brand_name', '').lower()
-            device_name = row.get('device_name', '').lower()
-            
+        mentioned_device = self._find_mentioned_device(user_input_lower)
+        if mentioned_device:
             # If both brand and device name are in the query, it's probably a device search
-            if brand_name in user_input.lower() and device_name in user_input.lower():
-                return DEVICE_TEMPLATES['found_device'].format(
-                    brand_name=brand_name,
-                    device_name=device_name
-                )
+            brand_name, device_name = mentioned_device
+            return DEVICE_TEMPLATES['found_device'].format(
+                brand_name=brand_name,
+                device_name=device_name
+            )
         
         # Handle recommendation category separately
         if category == 'recommendation':
@@ -878,6 +1159,20 @@ class DeviceAIAssistant:
         Returns:
             List of recommended devices with their details
         """
+        # Recommendations only depend on the lowercased query, so they are cached by it
+        normalized_query = query.lower() if query else None
+        
+        # Callers may modify the devices, so hand out copies of the cached ones
+        return [
+            dict(device, highlights=list(device['highlights']))
+            for device in self._recommend_cached(normalized_query)
+        ]
+    
+    def _recommend_for_normalized_query(self, query):
+        """Build recommendations for a lowercased query (or None).
+        
+        Only called through self._recommend_cached; see get_device_recommendations.
+        """
         try:
             # If no data is available, return empty list
             if self.unified_data.empty:
@@ -885,71 +1180,70 @@ class DeviceAIAssistant:
                 return []
             
             # Add debugging
-            logger.info(f"Generating recommendations for query: {query}")
-            logger.info(f"Data available: {len(self.unified_data)} devices")
+            logger.info("Generating recommendations for query: {}", query)
+            logger.info("Data available: {} devices", len(self.unified_data))
             
-            # Start with all devices
-            device_pool = self.unified_data.copy()
+            # Start with all devices, tracked as row positions so that filtering
+            # and ordering never materialize intermediate frames
+            device_pool = np.arange(len(self.unified_data))
             
             # Default to high-end devices if no specific category is mentioned
             price_category = 'high_end'
             focus_areas = []
             
             # If a specific brand is mentioned, filter for that brand
+            # (the query is already lowercased by get_device_recommendations)
             brand_focus = None
             for brand in POPULAR_BRANDS:
-                if query and brand in query.lower():
+                if query and brand in query:
                     brand_focus = brand
-                    logger.info(f"Filtering recommendations for brand: {brand}")
+                    logger.info("Filtering recommendations for brand: {}", brand)
                     # Create a more flexible pattern to match variations of the brand name
                     pattern = brand.lower()
-                    device_pool = device_pool[device_pool['brand_name'].str.lower().str.contains(pattern, na=False)]
+                    device_pool = np.array(sorted(
+                        position
+                        for brand_lower, brand_positions in self._brand_positions.items()
+                        if pattern in brand_lower
+                        for position in brand_positions
+                    ), dtype=np.intp)
                     break
             
             # Extract category and focus areas from query
             if query:
-                query_lower = query.lower()
+                # Find every feature mentioned in the query in a single pass
+                keyword_hits = set(_iter_automaton(INTENT_AUTOMATON, query))
+                mentioned_features = [feature for feature in FEATURE_KEYWORDS if ('feature', feature) in keyword_hits]
                 
-                # Determine price category
-                for cat, terms in FEATURE_KEYWORDS.items():
-                    if cat in ['high_end', 'mid_range', 'budget']:
-                        for term in terms:
-                            if term in query_lower:
-                                price_category = cat
-                                logger.info(f"Detected price category: {price_category}")
-                                break
+                # Determine price category (the last one mentioned in FEATURE_KEYWORDS order wins)
+                for cat in mentioned_features:
+                    if cat in PRICE_CATEGORIES:
+                        price_category = cat
+                        logger.info("Detected price category: {}", price_category)
                 
                 # Determine focus areas
-                for focus, terms in FEATURE_KEYWORDS.items():
-                    if focus not in ['high_end', 'mid_range', 'budget']:
-                        for term in terms:
-                            if term in query_lower:
-                                focus_areas.append(focus)
-                                logger.info(f"Detected focus area: {focus}")
-                                break
+                for focus in mentioned_features:
+                    if focus not in PRICE_CATEGORIES:
+                        focus_areas.append(focus)
+                        logger.info("Detected focus area: {}", focus)
             
-            logger.info(f"Selected price category: {price_category}, focus areas: {focus_areas}")
+            logger.info("Selected price category: {}, focus areas: {}", price_category, focus_areas)
             
             # Prepare recommendations
             recommendations = []
-            unique_devices = set()  # To avoid duplicates
+            unique_devices = set()  # (brand, device) pairs already added, to avoid duplicates
             
-            # Define popular brands if not already filtered by brand
-            popular_brands = ['Samsung', 'Apple', 'Google', 'Xiaomi', 'OnePlus', 'Huawei']
+            # Popular brands, in the order their devices are preferred
+            popular_brands = RECOMMENDED_BRANDS
             
             # If we're already focusing on a specific brand, prioritize devices from that brand
-            if brand_focus:
-                for brand in popular_brands:
-                    if brand.lower() == brand_focus:
-                        popular_brands = [brand]
-                        break
-            
-            # Prioritize popular brands first
-            brand_prioritized = device_pool[device_pool['brand_name'].isin(popular_brands)]
-            other_brands = device_pool[~device_pool['brand_name'].isin(popular_brands)]
+            if brand_focus in RECOMMENDED_BRANDS_BY_LOWER:
+                popular_brands = (RECOMMENDED_BRANDS_BY_LOWER[brand_focus],)
             
-            # Combine with popular brands first
-            device_pool = pd.concat([brand_prioritized, other_brands]).drop_duplicates()
+            # Skip repeated rows, then put popular brands first keeping the data order
+            # within each group (duplicates share a brand, so the first copy stays first)
+            device_pool = device_pool[~self._duplicate_rows[device_pool]]
+            is_popular = self.unified_data['brand_name'].isin(popular_brands).to_numpy()[device_pool]
+            device_pool = device_pool[np.argsort(~is_popular, kind='stable')]
             
             # Filter based on price category if possible
             # This is a simplification - in a real implementation, you would need price data
@@ -957,34 +1251,36 @@ class DeviceAIAssistant:
             if price_category == 'high_end':
                 # For high-end, assume the most recent devices are high-end
                 # In a real implementation, you would filter based on actual price or specs
-                filtered_devices = device_pool.head(30)  # Take the first 30 as high-end
+                filtered_devices = device_pool[:30]  # Take the first 30 as high-end
             elif price_category == 'mid_range':
                 # For mid-range, take devices in the middle of the list
                 mid_start = max(0, len(device_pool) // 3)
                 mid_end = min(len(device_pool), mid_start + 30)
-                filtered_devices = device_pool.iloc[mid_start:mid_end]
+                filtered_devices = device_pool[mid_start:mid_end]
             elif price_category == 'budget':
                 # For budget, take devices from the end of the list
                 # In a real implementation, you would filter based on actual price
                 budget_start = max(0, len(device_pool) - 30)
-                filtered_devices = device_pool.iloc[budget_start:]
+                filtered_devices = device_pool[budget_start:]
             else:
                 # Default to all devices
                 filtered_devices = device_pool
             
-            logger.info(f"Found {len(filtered_devices)} devices after filtering")
+            logger.info("Found {} devices after filtering", len(filtered_devices))
             
-            # Collect recommendations (limit to top 5)
-            for _, device in filtered_devices.iterrows():
+            # Collect recommendations (limit to top 5), stopping as soon as there are enough
+            for position in filtered_devices:
+                record = self._records[position]
+                
                 # Create a unique key for this device
-                device_key = f"{device['brand_name']}_{device['device_name']}"
+                device_key = (record.brand_name, record.device_name)
                 
                 # Skip if we already added this device
                 if device_key in unique_devices:
                     continue
                 
                 # Format the device data
-                formatted_device = self._format_device_data(device)
+                formatted_device = self._format_device_at(position)
                 
                 # Find highlight features based on focus areas
                 highlights = []
@@ -993,52 +1289,16 @@ class DeviceAIAssistant:
                 if 'specifications' in formatted_device and formatted_device['specifications']:
                     specs = formatted_device['specifications']
                     
-                    # Look for camera information
-                    if 'camera' in focus_areas or not focus_areas:
-                        if 'main_camera' in specs or 'Main Camera' in specs:
-                            camera_info = specs.get('main_camera', specs.get('Main Camera', {}))
-                            if isinstance(camera_info, dict) and 'modules' in camera_info:
-                                highlights.append(f"Main camera: {camera_info['modules']}")
-                            elif isinstance(camera_info, str):
-                                highlights.append(f"Main camera: {camera_info}")
-                    
-                    # Look for battery information
-                    if 'battery' in focus_areas or not focus_areas:
-                        if 'battery_type' in specs:
-                            highlights.append(f"Battery: {specs['battery_type']}")
-                        elif 'battery' in specs and isinstance(specs['battery'], dict) and 'type' in specs['battery']:
-                            highlights.append(f"Battery: {specs['battery']['type']}")
-                    
-                    # Look for performance information
-                    if 'performance' in focus_areas or not focus_areas:
-                        if 'platform' in specs or 'Platform' in specs:
-                            platform_info = specs.get('platform', specs.get('Platform', {}))
-                            if isinstance(platform_info, dict):
-                                chipset = platform_info.get('chipset', '')
-                                if chipset:
-                                    highlights.append(f"Processor: {chipset}")
-                    
-                    # Look for display information
-                    if 'display' in focus_areas or not focus_areas:
-                        if 'display' in specs or 'Display' in specs:
-                            display_info = specs.get('display', specs.get('Display', {}))
-                            if isinstance(display_info, dict):
-                                size = display_info.get('size', '')
-                                if size:
-                                    highlights.append(f"Display: {size}")
-                    
-                    # Look for storage information
-                    if 'storage' in focus_areas or not focus_areas:
-                        if 'memory' in specs or 'Memory' in specs:
-                            memory_info = specs.get('memory', specs.get('Memory', {}))
-                            if isinstance(memory_info, dict):
-                                storage = memory_info.get('internal', '')
-                                if storage:
-                                    highlights.append(f"Storage: {storage}")
+                    # Look for the highlight of each requested (or, by default, every) focus area
+                    for focus, label, lookups in HIGHLIGHT_RULES:
+                        if focus in focus_areas or not focus_areas:
+                            value = _highlight_value(specs, lookups)
+                            if value:
+                                highlights.append(f"{label}: {value}")
                     
                     # Add other focus areas similarly
                     for focus in focus_areas:
-                        if focus not in ['camera', 'battery', 'performance', 'display', 'storage']:
+                        if focus not in HIGHLIGHT_FOCUS_AREAS:
                             for key in specs.keys():
                                 if focus.lower() in key.lower():
                                     if isinstance(specs[key], dict):
@@ -1063,7 +1323,7 @@ class DeviceAIAssistant:
                     elif price_category == 'budget':
                         highlights.append("Affordable device with good features")
                     else:
-                        highlights.append(f"Popular {device['brand_name']} device")
+                        highlights.append(f"Popular {record.brand_name} device")
                 
                 # Add highlights to the formatted device
                 formatted_device['highlights'] = highlights
@@ -1076,18 +1336,17 @@ class DeviceAIAssistant:
                 if len(recommendations) >= 5:
                     break
             
-            logger.info(f"Generated {len(recommendations)} recommendations")
+            logger.info("Generated {} recommendations", len(recommendations))
             if len(recommendations) > 0:
-                logger.info(f"First recommendation: {recommendations[0]['brand_name']} {recommendations[0]['device_name']}")
+                logger.info("First recommendation: {} {}", recommendations[0]['brand_name'], recommendations[0]['device_name'])
             
             # If no recommendations found, use fallback approach to just get the most recent popular devices
             if not recommendations:
                 logger.info("No matching recommendations found, using fallback approach")
                 for brand in popular_brands:
-                    brand_devices = device_pool[device_pool['brand_name'] == brand]
-                    if not brand_devices.empty:
-                        device = brand_devices.iloc[0]
-                        formatted_device = self._format_device_data(device)
+                    position = next((position for position in device_pool if self._records[position].brand_name == brand), None)
+                    if position is not None:
+                        formatted_device = self._format_device_at(position)
                         formatted_device['highlights'] = [f"Top {brand} device"]
                         recommendations.append(formatted_device)
                         if len(recommendations) >= 5:
@@ -1096,8 +1355,7 @@ class DeviceAIAssistant:
             return recommendations
         
         except Exception as e:
-            logger.error(f"Error generating device recommendations: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.exception(f"Error generating device recommendations: {str(e)}")
             return []
     
     def train_conversation_model(self, user_input, category, response):
@@ -1105,10 +1363,41 @@ class DeviceAIAssistant:
         
         This is a simple placeholder implementation.
         """
-        logger.info(f"Training conversation model with: category={category}, input={user_input}")
+        logger.info("Training conversation model with: category={}, input={}", category, user_input)
         # In a real implementation, this would update a machine learning model
         return True
 
+    def _comparison_spec_value(self, position, spec):
+        """String-valued view of one spec of the device at position, as compared.
+        
+        Computed once per (position, spec) and cached; an empty dict means
+        the device does not specify it.
+        """
+        key = (position, spec)
+        formatted_spec_value = self._comparison_values.get(key)
+        if formatted_spec_value is not None:
+            return formatted_spec_value
+        
+        spec_value = self._extract_requested_specs(self._specs[position], [spec], self._flat_specs[position])
+        
+        # Ensure spec_value is JSON serializable
+        formatted_spec_value = {}
+        if spec_value and spec in spec_value and isinstance(spec_value[spec], dict):
+            # Convert all values to strings to ensure serializability
+            for key_name, value in spec_value[spec].items():
+                if isinstance(value, dict):
+                    # Handle nested dictionaries
+                    formatted_spec_value[key_name] = ", ".join(
+                        f"{sub_key}: {sub_value}" for sub_key, sub_value in value.items()
+                    )
+                else:
+                    formatted_spec_value[key_name] = str(value)
+        elif spec_value:
+            formatted_spec_value = {"value": str(spec_value)}
+        
+        self._comparison_values[key] = formatted_spec_value
+        return formatted_spec_value
+    
     def compare_devices(self, query):
         """
         Extract devices for comparison and their aspects from the query
@@ -1119,7 +1408,7 @@ class DeviceAIAssistant:
         Returns:
             dict: Comparison results with devices and compared specifications
         """
-        logger.info(f"Processing comparison query: {query}")
+        logger.info("Processing comparison query: {}", query)
         
         # Extract potential device names from the query
         device_names = self._extract_device_names(query)
@@ -1133,28 +1422,24 @@ class DeviceAIAssistant:
         
         # Limit to comparing two devices for simplicity
         devices_to_compare = device_names[:2]
-        logger.info(f"Devices to compare: {devices_to_compare}")
+        logger.info("Devices to compare: {}", devices_to_compare)
         
         # Extract specifications to compare
         specs_to_compare = self._extract_specification_requests(query)
         if not specs_to_compare:
             # If no specific specs mentioned, use common comparison points
-            specs_to_compare = ["processor", "camera", "display", "battery", "memory"]
+            specs_to_compare = DEFAULT_COMPARISON_SPECS
         
-        logger.info(f"Specifications to compare: {specs_to_compare}")
+        logger.info("Specifications to compare: {}", specs_to_compare)
         
-        # Find devices in the database
-        device_data = []
-        formatted_devices = []
+        # Find devices in the database, by row position
+        device_positions = []
         for device_info in devices_to_compare:
-            # Pass a list containing a single device_info to _search_devices_by_name
-            devices_df = self._search_devices_by_name([device_info])
+            # Each device is looked up on its own, so each gets its own fuzzy fallback
+            positions = self._search_device_positions([device_info])
             
-            if not devices_df.empty:
-                device_data.append(devices_df.iloc[0])
-                # Format the device data to ensure it's JSON serializable
-                formatted_device = self._format_device_data(devices_df.iloc[0])
-                formatted_devices.append(formatted_device)
+            if positions:
+                device_positions.append(positions[0])
             else:
                 device_name = f"{device_info.get('brand', '')} {device_info.get('device', '')}"
                 return {
@@ -1162,7 +1447,10 @@ class DeviceAIAssistant:
                     "message": f"I couldn't find information for {device_name}. Please check the device name."
                 }
         
-        if len(device_data) < 2 or len(formatted_devices) < 2:
+        # Format the device data to ensure it's JSON serializable
+        formatted_devices = [self._format_device_at(position) for position in device_positions]
+        
+        if len(device_positions) < 2 or len(formatted_devices) < 2:
             return {
                 "success": False,
                 "message": "I couldn't find enough information to compare these devices."
@@ -1176,31 +1464,19 @@ class DeviceAIAssistant:
             "summary": f"Comparison between {devices_to_compare[0]['brand']} {devices_to_compare[0]['device']} and {devices_to_compare[1]['brand']} {devices_to_compare[1]['device']}"
         }
         
-        # Extract and format specs for comparison
+        # Extract and format specs for comparison, pairing each device with its name once
+        named_positions = [
+            (f"{device['brand_name']} {device['device_name']}", position)
+            for device, position in zip(formatted_devices, device_positions)
+        ]
         for spec in specs_to_compare:
             comparison_result["compared_specs"][spec] = []
-            for i, device in enumerate(device_data):
-                spec_value = self._extract_requested_specs(device['specs_dict'], [spec])
-                
-                # Ensure spec_value is JSON serializable
-                formatted_spec_value = {}
-                if spec_value and spec in spec_value and isinstance(spec_value[spec], dict):
-                    # Convert all values to strings to ensure serializability
-                    for key, value in spec_value[spec].items():
-                        if isinstance(value, dict):
-                            # Handle nested dictionaries
-                            nested_values = []
-                            for sub_key, sub_value in value.items():
-                                nested_values.append(f"{sub_key}: {sub_value}")
-                            formatted_spec_value[key] = ", ".join(nested_values)
-                        else:
-                            formatted_spec_value[key] = str(value)
-                elif spec_value:
-                    formatted_spec_value = {"value": str(spec_value)}
+            for device_name, position in named_positions:
+                formatted_spec_value = self._comparison_spec_value(position, spec)
                 
                 comparison_result["compared_specs"][spec].append({
-                    "device_name": f"{formatted_devices[i]['brand_name']} {formatted_devices[i]['device_name']}",
-                    "value": formatted_spec_value if formatted_spec_value else "Not specified"
+                    "device_name": device_name,
+                    "value": dict(formatted_spec_value) if formatted_spec_value else "Not specified"
                 })
         
         return comparison_result
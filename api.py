@@ -9,6 +9,7 @@ import uuid
 from datetime import datetime
 from functools import wraps
 from typing import Dict, List, Optional
+from json_utils import loads as _loads
 
 # Create Blueprint for API routes
 api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
@@ -28,8 +29,8 @@ API_KEYS_FILE = 'api_keys.json'
 def load_api_keys():
     if os.path.exists(API_KEYS_FILE):
         try:
-            with open(API_KEYS_FILE, 'r') as f:
-                return json.load(f)
+            with open(API_KEYS_FILE, 'rb') as f:
+                return _loads(f.read())
         except Exception as e:
             print(f"Error loading API keys: {str(e)}")
     return {"keys": {}}
@@ -158,23 +159,37 @@ def get_devices_from_csv(brand_name=None, limit=100, offset=0):
         "offset": offset
     }
 
+# Specifications JSON by device URL, rebuilt whenever the specs file changes
+_specs_index = (None, {})
+
+def load_specs_index(specs_file):
+    global _specs_index
+    mtime = os.path.getmtime(specs_file)
+    if _specs_index[0] != mtime:
+        specs_by_url = {}
+        with open(specs_file, 'r', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader)  # Skip header
+            
+            for row in reader:
+                if len(row) >= 4 and row[0] not in specs_by_url:  # device_url, name, pictures, specifications
+                    specs_by_url[row[0]] = row[3]
+        _specs_index = (mtime, specs_by_url)
+    return _specs_index[1]
+
 # Helper function to get device specifications
 def get_device_specs(device_url):
     specs_file = 'device_specifications.csv'
     
     if os.path.exists(specs_file):
         try:
-            with open(specs_file, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                next(reader)  # Skip header
-                
-                for row in reader:
-                    if len(row) >= 4 and row[0] == device_url:  # device_url, name, pictures, specifications
-                        try:
-                            specs = json.loads(row[3])
-                            return specs
-                        except:
-                            return None
+            raw_specs = load_specs_index(specs_file).get(device_url)
+            if raw_specs is not None:
+                try:
+                    specs = _loads(raw_specs)
+                    return specs
+                except:
+                    return None
         except Exception as e:
             print(f"Error reading specs file: {str(e)}")
     
@@ -184,6 +199,7 @@ def get_device_specs(device_url):
 def search_devices(query, limit=100, offset=0):
     devices = []
     brands_file = 'brands_devices.csv'
+    query_lower = query.lower()
     
     if os.path.exists(brands_file):
         try:
@@ -193,8 +209,8 @@ def search_devices(query, limit=100, offset=0):
                 
                 for row in reader:
                     if len(row) >= 3:  # brand_name, device_name, device_url, device_image
-                        if (query.lower() in row[0].lower() or  # Brand name
-                            query.lower() in row[1].lower()):   # Device name
+                        if (query_lower in row[0].lower() or  # Brand name
+                            query_lower in row[1].lower()):   # Device name
                             device = {
                                 "brand": row[0],
                                 "name": row[1],
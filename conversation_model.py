@@ -1,15 +1,29 @@
 import os
 import json
+import functools
 import random
 import numpy as np
 from loguru import logger
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import pickle
 import re
-import torch
+import ahocorasick
 from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
 
+# Patterns used to clean up generated responses
+SPEAKER_PREFIX_PATTERN = re.compile(r'User:|Sumail-000:')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Category-specific context added to language model prompts
+CATEGORY_PROMPTS = {
+    'greeting': "I greet users warmly. ",
+    'farewell': "I say goodbye politely. ",
+    'thanks': "I respond to gratitude graciously. ",
+    'identity': "I explain who I am and what I can do. ",
+    'confusion': "I help clarify misunderstandings. "
+}
+
+
 class ConversationModel:
     """A trainable conversation model for the AI assistant with neural capabilities."""
     
@@ -58,6 +72,18 @@ class ConversationModel:
                         'sumail', 'sumail-000', 'who created you', 'what can you do', 'your purpose', 'what do you do']
         }
         
+        # Match every category pattern in a single pass over the input
+        self.category_automaton = ahocorasick.Automaton()
+        for category, patterns in self.categories.items():
+            for pattern in patterns:
+                categories = self.category_automaton.get(pattern, set())
+                categories.add(category)
+                self.category_automaton.add_word(pattern, categories)
+        self.category_automaton.make_automaton()
+        
+        # Repeated inputs reuse their category until the conversation data changes
+        self._categorize_cached = functools.lru_cache(maxsize=1024)(self._categorize_normalized_input)
+        
         # Initialize conversation context
         self.conversation_context = []
         self.max_context_length = 5
@@ -180,14 +206,21 @@ class ConversationModel:
         """
         if not user_input or user_input.strip() == '':
             return 'default'
-            
-        user_input_lower = user_input.lower()
         
-        # Check for exact matches in categories
-        for category, patterns in self.categories.items():
-            for pattern in patterns:
-                if pattern in user_input_lower:
-                    return category
+        return self._categorize_cached(user_input.lower())
+    
+    def _categorize_normalized_input(self, user_input_lower):
+        """Categorize lowercased user input.
+        
+        Only called through self._categorize_cached; see categorize_input.
+        """
+        # Check for exact matches in categories, in category order
+        matched_categories = set()
+        for _, categories in self.category_automaton.iter(user_input_lower):
+            matched_categories.update(categories)
+        for category in self.categories:
+            if category in matched_categories:
+                return category
         
         # Try semantic matching if no exact match
         try:
@@ -220,8 +253,9 @@ class ConversationModel:
             input_vector = all_vectors[-1]
             pattern_vectors = all_vectors[:-1]
             
-            # Calculate similarities
-            similarities = cosine_similarity(input_vector, pattern_vectors)[0]
+            # Calculate similarities; TF-IDF rows are already L2-normalized, so the
+            # cosine similarity is a plain sparse dot product
+            similarities = (pattern_vectors @ input_vector.T).toarray().ravel()
             
             # Find best match
             if len(similarities) > 0:
@@ -331,16 +365,7 @@ class ConversationModel:
         prompt = "I am Sumail-000, a helpful AI assistant for mobile devices. "
         
         # Add some category-specific context
-        if category == 'greeting':
-            prompt += "I greet users warmly. "
-        elif category == 'farewell':
-            prompt += "I say goodbye politely. "
-        elif category == 'thanks':
-            prompt += "I respond to gratitude graciously. "
-        elif category == 'identity':
-            prompt += "I explain who I am and what I can do. "
-        elif category == 'confusion':
-            prompt += "I help clarify misunderstandings. "
+        prompt += CATEGORY_PROMPTS.get(category, "")
         
         # Add recent conversation context
         for item in self.conversation_context[-3:]:  # Last 3 messages
@@ -362,13 +387,13 @@ class ConversationModel:
             Cleaned response
         """
         # Remove any further "User:" or "Sumail-000:" parts
-        response = re.split(r'User:|Sumail-000:', response)[0].strip()
+        response = SPEAKER_PREFIX_PATTERN.split(response)[0].strip()
         
         # Remove unwanted characters
         response = response.replace('\n', ' ').strip()
         
         # Fix spacing
-        response = re.sub(r'\s+', ' ', response)
+        response = WHITESPACE_PATTERN.sub(' ', response)
         
         return response
     
@@ -388,6 +413,8 @@ class ConversationModel:
         if response not in self.conversation_data[category]:
             self.conversation_data[category].append(response)
             logger.info(f"Added new response to category '{category}'")
+            # Categories with responses take part in semantic matching
+            self._categorize_cached.cache_clear()
         
         # Save the updated data
         self.save_conversation_data()
@@ -0,0 +1,12 @@
+"""
+JSON helpers shared by the AI assistant and the API.
+"""
+
+import json
+
+# orjson parses JSON several times faster than json; fall back to json without it
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
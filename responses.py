@@ -4,6 +4,21 @@ This module contains all the hardcoded responses used by the AI assistant,
 separated from core logic for better maintainability.
 """
 
+import re
+
+# Short keywords that also occur inside unrelated words ('or' in 'for', 'top' in 'laptop')
+WHOLE_WORD_KEYWORDS = {"or", "vs", "top", "pick"}
+
+
+def _keyword_pattern(keywords):
+    """Compile a matcher for any of keywords as a substring, or as a whole word
+    (optionally plural, e.g. 'picks') for WHOLE_WORD_KEYWORDS."""
+    substrings = [re.escape(keyword) for keyword in keywords if keyword not in WHOLE_WORD_KEYWORDS]
+    whole_words = [re.escape(keyword) for keyword in keywords if keyword in WHOLE_WORD_KEYWORDS]
+    if whole_words:
+        substrings.append(r'\b(?:' + '|'.join(whole_words) + r')s?\b')
+    return re.compile('|'.join(substrings))
+
 # Category-based response templates
 CATEGORY_RESPONSES = {
     'greeting': [
@@ -175,6 +190,9 @@ RECOMMENDATION_KEYWORDS = [
     "want to buy", "considering", "thinking about", "planning to get"
 ]
 
+# Precompiled matcher for any recommendation keyword
+RECOMMENDATION_RE = _keyword_pattern(RECOMMENDATION_KEYWORDS)
+
 # Brands for brand detection
 POPULAR_BRANDS = [
     "samsung", "apple", "iphone", "google", "pixel", "xiaomi", "huawei", "oneplus", 
@@ -196,6 +214,9 @@ COMPARISON_KEYWORDS = [
     "face off", "showdown", "battle", "comparison between", "compared to"
 ]
 
+# Precompiled matcher for any comparison keyword
+COMPARISON_RE = _keyword_pattern(COMPARISON_KEYWORDS)
+
 # Specification keywords
 SPECIFICATION_KEYWORDS = [
     "specs", "specifications", "details", "features", "characteristics", 
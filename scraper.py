@@ -8,6 +8,10 @@ from typing import Dict, List, Optional, Tuple
 import os
 import asyncio
 import random
+import re
+
+# Region/model markers that start a new entry in a band listing
+MODEL_INDICATOR_PATTERN = re.compile(r'International|USA|EU|China|Japan|Korea|India')
 
 class GSMArenaScraper:
     def __init__(self):
@@ -334,7 +338,7 @@ class GSMArenaScraper:
                                         bands_list = []
                                         current_band = ""
                                         for part in value.split(' - '):
-                                            if any(model_indicator in part for model_indicator in ['International', 'USA', 'EU', 'China', 'Japan', 'Korea', 'India']):
+                                            if MODEL_INDICATOR_PATTERN.search(part):
                                                 if current_band:
                                                     bands_list.append(f"{current_band} - {part}")
                                                     current_band = ""